@@ -22,6 +22,8 @@
 ///     CAdapterFactory::HandleRead
 ///     CAdapterFactory::Timeout
 ///     CAdapterFactory::SessionProtocol
+///     CAdapterFactory::AfterSessionWrite
+///     CAdapterFactory::SessionWriteTimeout
 ///
 /// These source code files were created at Missouri University of Science and
 /// Technology, and are intended for use in teaching or research. They may be
@@ -622,6 +624,10 @@ namespace freedm {
 /// @post If the packet is well-formed, creates a new adapter and responds to
 /// the plug and play connection with a start packet.
 /// @post Otherwise, responds with a bad request that indicates the error.
+/// @post The response is written asynchronously so that a slow client does
+/// not stall the other adapters that share m_ios.
+/// @post The write is cancelled if it does not finish within the
+/// DEV_SOCKET_TIMEOUT timing value.
 ///
 /// @limitations None.
 ////////////////////////////////////////////////////////////////////////////////
@@ -629,8 +635,8 @@ namespace freedm {
                 Logger.Trace << __PRETTY_FUNCTION__ << std::endl;
 
                 std::istream packet(&m_buffer);
-                boost::asio::streambuf response;
-                std::ostream response_stream(&response);
+                boost::shared_ptr<boost::asio::streambuf> response(new boost::asio::streambuf);
+                std::ostream response_stream(response.get());
 
                 boost::property_tree::ptree config;
 
@@ -719,7 +725,7 @@ namespace freedm {
                     }
 
                     response_stream << "Start\r\n\r\n";
-                    Logger.Status << "Blocking to send Start to client" << std::endl;
+                    Logger.Status << "Sending Start to client" << std::endl;
                 }
                 catch (EBadRequest &e) {
                     Logger.Warn << "Rejected client: " << e.what() << std::endl;
@@ -727,23 +733,84 @@ namespace freedm {
                     response_stream << "BadRequest\r\n";
                     response_stream << e.what() << "\r\n\r\n";
 
-                    Logger.Status << "Blocking to send BadRequest to client" << std::endl;
+                    Logger.Status << "Sending BadRequest to client" << std::endl;
                 }
                 catch (std::exception &e) {
                     Logger.Warn << "Rejected client: " << e.what() << std::endl;
                     response_stream << "Error\r\n" << e.what() << "\r\n\r\n";
-                    Logger.Status << "Blocking to send Error to client" << std::endl;
+                    Logger.Status << "Sending Error to client" << std::endl;
                 }
 
-                try {
-                    TimedWrite(*m_server->GetClient(), response,
-                               CTimings::Get("DEV_SOCKET_TIMEOUT"));
+                boost::shared_ptr<boost::asio::deadline_timer> timer(
+                        new boost::asio::deadline_timer(m_ios));
+                timer->expires_from_now(boost::posix_time::milliseconds(
+                        CTimings::Get("DEV_SOCKET_TIMEOUT")));
+                timer->async_wait(boost::bind(&CAdapterFactory::SessionWriteTimeout, this,
+                                              boost::asio::placeholders::error,
+                                              timer, m_server->GetClient()));
+
+                // the handler keeps the client and response alive until the write ends
+                boost::asio::async_write(*m_server->GetClient(), *response,
+                                         boost::bind(&CAdapterFactory::AfterSessionWrite, this,
+                                                     boost::asio::placeholders::error,
+                                                     timer, m_server->GetClient(), response));
+
+                m_server->StartAccept();
+            }
+
+////////////////////////////////////////////////////////////////////////////////
+/// Reports the result of the response to a plug and play hello message.
+///
+/// @pre None.
+/// @post Stops the timer that bounds the write.
+/// @post Logs a warning if the response could not be sent.
+/// @param e The error code associated with the write operation.
+/// @param timer The timer that cancels the write on timeout.
+///
+/// The unnamed connection and buffer parameters are not used; they are bound
+/// to the handler only so that both outlive the asynchronous write.
+///
+/// @limitations None.
+////////////////////////////////////////////////////////////////////////////////
+            void CAdapterFactory::AfterSessionWrite(const boost::system::error_code &e,
+                                                    boost::shared_ptr<boost::asio::deadline_timer> timer,
+                                                    CTcpServer::Connection /* client */,
+                                                    boost::shared_ptr<boost::asio::streambuf> /* response */) {
+                Logger.Trace << __PRETTY_FUNCTION__ << std::endl;
+
+                // the timeout may already be queued, so also move its expiry
+                timer->expires_at(boost::posix_time::pos_infin);
+
+                if (e) {
+                    Logger.Warn << "Failed to respond to client: " << e.message() << std::endl;
                 }
-                catch (std::exception &e) {
-                    Logger.Warn << "Failed to respond to client: " << e.what() << std::endl;
+            }
+
+////////////////////////////////////////////////////////////////////////////////
+/// Cancels the response to a plug and play hello message on timeout.
+///
+/// @pre None.
+/// @post If the write has not finished, cancels the operations on the client.
+/// @param e The error code associated with the timer.
+/// @param timer The timer that bounds the write.
+/// @param client The connection that is receiving the response.
+///
+/// @limitations None.
+////////////////////////////////////////////////////////////////////////////////
+            void CAdapterFactory::SessionWriteTimeout(const boost::system::error_code &e,
+                                                      boost::shared_ptr<boost::asio::deadline_timer> timer,
+                                                      CTcpServer::Connection client) {
+                Logger.Trace << __PRETTY_FUNCTION__ << std::endl;
+
+                if (e || timer->expires_at() > boost::asio::deadline_timer::traits_type::now()) {
+                    // the write finished first
+                    return;
                 }
 
-                m_server->StartAccept();
+                Logger.Warn << "Timed out responding to client." << std::endl;
+
+                boost::system::error_code ec;
+                client->cancel(ec);
             }
 
         } // namespace device
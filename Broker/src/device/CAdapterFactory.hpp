@@ -35,8 +35,10 @@
 #include <stdexcept>
 
 #include <boost/thread.hpp>
+#include <boost/shared_ptr.hpp>
 #include <boost/noncopyable.hpp>
 #include <boost/asio/ip/tcp.hpp>
+#include <boost/asio/streambuf.hpp>
 #include <boost/asio/io_service.hpp>
 #include <boost/asio/deadline_timer.hpp>
 #include <boost/property_tree/ptree_fwd.hpp>
@@ -96,6 +98,17 @@ private:
     /// Disconnects plug and play devices that timeout.
     void Timeout(const boost::system::error_code & e);
 
+    /// Handles the completion of a session protocol response.
+    void AfterSessionWrite(const boost::system::error_code & e,
+            boost::shared_ptr<boost::asio::deadline_timer> timer,
+            CTcpServer::Connection client,
+            boost::shared_ptr<boost::asio::streambuf> response);
+
+    /// Cancels a session protocol response that takes too long.
+    void SessionWriteTimeout(const boost::system::error_code & e,
+            boost::shared_ptr<boost::asio::deadline_timer> timer,
+            CTcpServer::Connection client);
+
     /// Set of device adapters managed by the factory.
     std::map<std::string, IAdapter::Pointer> m_adapters;
 
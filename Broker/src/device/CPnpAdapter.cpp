@@ -19,7 +19,7 @@
 ///     CPnpAdapter::AfterWrite
 ///     CPnpAdapter::Stop
 ///     CPnpAdapter::ReadStatePacket
-///     CPnpAdapter::SendCommandPacket
+///     CPnpAdapter::WriteCommandPacket
 ///
 /// These source code files were created at Missouri University of Science and
 /// Technology, and are intended for use in teaching or research. They may be
@@ -42,8 +42,9 @@
 #include "CTimings.hpp"
 #include "SynchronousTimeout.hpp"
 
+#include <algorithm>
+#include <istream>
 #include <map>
-#include <sstream>
 #include <stdexcept>
 
 #include <boost/bind.hpp>
@@ -58,6 +59,37 @@ namespace device {
 namespace {
 /// This file's logger.
 CLocalLogger Logger(__FILE__);
+
+/// Initial capacity of the buffers that hold a received packet.
+const std::size_t PNP_FRAME_SIZE = 16384;
+
+/// Header of a packet that carries device states.
+const std::string PNP_DEVICE_STATES = "DeviceStates";
+
+/// Header of a packet that ends the session.
+const std::string PNP_POLITE_DISCONNECT = "PoliteDisconnect";
+
+/// Characters that separate the tokens of a packet, as for std::isspace.
+const char * const PNP_WHITESPACE = " \t\n\v\f\r";
+
+/// Reads the next whitespace-delimited token of a packet.
+bool NextToken(const std::string & packet, std::size_t & pos,
+        std::string & token)
+{
+    std::size_t begin, end;
+
+    begin = packet.find_first_not_of(PNP_WHITESPACE, pos);
+    if( begin == std::string::npos )
+    {
+        pos = packet.size();
+        return false;
+    }
+    end = std::min(packet.find_first_of(PNP_WHITESPACE, begin), packet.size());
+
+    token.assign(packet, begin, end - begin);
+    pos = end;
+    return true;
+}
 }
 
 ////////////////////////////////////////////////////////////////////////////////
@@ -101,6 +133,11 @@ CPnpAdapter::CPnpAdapter(boost::asio::io_service & service,
     Logger.Trace << __PRETTY_FUNCTION__ << std::endl;
 
     m_identifier = p.get<std::string>("identifier");
+
+    // async_read_until reads at most 512 bytes into an empty streambuf, so
+    // reserve room for a whole packet up front to receive it in one read
+    m_buffer.prepare(PNP_FRAME_SIZE);
+    m_frame.reserve(PNP_FRAME_SIZE);
 }
 
 ////////////////////////////////////////////////////////////////////////////////
@@ -121,6 +158,7 @@ CPnpAdapter::~CPnpAdapter()
 ///
 /// @pre None.
 /// @post m_heartbeat set to call CPnpAdapter::Timeout on expiration.
+/// @post m_commands caches the command packet line prefix of each signal.
 ///
 /// @limitations None.
 ////////////////////////////////////////////////////////////////////////////////
@@ -128,8 +166,22 @@ void CPnpAdapter::Start()
 {
     Logger.Trace << __PRETTY_FUNCTION__ << std::endl;
 
+    std::map<const DeviceSignal, const std::size_t>::iterator it, end;
+    std::string devname;
+
     IBufferAdapter::Start();
 
+    end = m_commandInfo.end();
+    for( it = m_commandInfo.begin(); it != end; it++ )
+    {
+        // remove the hostname identifier
+        devname = it->first.first;
+        devname = devname.substr(devname.find_last_of(":") + 1);
+
+        m_commands.push_back(CommandEntry(
+                devname + " " + it->first.second + " ", it->second));
+    }
+
     m_countdown->expires_from_now(boost::posix_time::milliseconds(
             CTimings::Get("DEV_PNP_HEARTBEAT")));
     m_countdown->async_wait(boost::bind(&CPnpAdapter::Timeout,
@@ -241,7 +293,8 @@ void CPnpAdapter::StartRead()
     m_buffer.consume(m_buffer.size());
     boost::asio::async_read_until(*m_client, m_buffer, "\r\n\r\n",
             boost::bind(&CPnpAdapter::HandleRead, shared_from_this(),
-            boost::asio::placeholders::error));
+            boost::asio::placeholders::error,
+            boost::asio::placeholders::bytes_transferred));
 }
 
 ////////////////////////////////////////////////////////////////////////////////
@@ -271,11 +324,14 @@ void CPnpAdapter::StartWrite()
 /// message will be sent to the client to indicate failure.
 /// @pre The packet must be stored in m_buffer.
 /// @post Processes the packet and prepares an appropriate response.
+/// @post Responds with a bad request if more than one packet was received.
 /// @param e The error code associated with the last read operation.
+/// @param bytes The number of bytes up to and including the delimiter.
 ///
 /// @limitations None.
 ////////////////////////////////////////////////////////////////////////////////
-void CPnpAdapter::HandleRead(const boost::system::error_code & e)
+void CPnpAdapter::HandleRead(const boost::system::error_code & e,
+        std::size_t bytes)
 {
     Logger.Trace << __PRETTY_FUNCTION__ << std::endl;
 
@@ -289,30 +345,42 @@ void CPnpAdapter::HandleRead(const boost::system::error_code & e)
         }
     }
 
-    std::istreambuf_iterator<char> end;
     std::iostream packet(&m_buffer);
-    std::string data, header;
+    std::string header;
+    std::size_t pos = 0;
+    bool pipelined;
 
     try
     {
-        Heartbeat();
+        // copy the delimited frame out of m_buffer in a single pass
+        m_frame.assign(boost::asio::buffers_begin(m_buffer.data()),
+                boost::asio::buffers_begin(m_buffer.data()) + bytes);
 
-        packet >> header;
-        data = std::string(std::istreambuf_iterator<char>(packet), end);
+        // the protocol is strictly request/response, so anything that arrived
+        // behind the delimiter is a second packet sent out of turn
+        pipelined = m_buffer.size() > bytes;
+        m_buffer.consume(m_buffer.size());
+
+        NextToken(m_frame, pos, header);
         Logger.Debug << "Received " << header << " packet." << std::endl;
 
-        m_buffer.consume(m_buffer.size());
-        if( header == "DeviceStates" )
+        if( pipelined )
+        {
+            std::string msg = "Received a second packet before the response.";
+            packet << "BadRequest\r\n" << msg << "\r\n\r\n";
+            Logger.Warn << msg << std::endl;
+        }
+        else if( header == PNP_DEVICE_STATES )
         {
             try
             {
-                ReadStatePacket(data);
+                ReadStatePacket(m_frame, pos);
                 if( m_buffer_initialized == false )
                 {
                     RevealDevices();
                     m_buffer_initialized = true;
                 }
-                packet << GetCommandPacket();
+                WriteCommandPacket(packet);
             }
             catch(boost::bad_lexical_cast &)
             {
@@ -326,7 +394,7 @@ void CPnpAdapter::HandleRead(const boost::system::error_code & e)
                 packet << "BadRequest\r\n" << e.what() << "\r\n\r\n";
             }
         }
-        else if( header == "PoliteDisconnect" )
+        else if( header == PNP_POLITE_DISCONNECT )
         {
             Logger.Info << "Polite Disconnect Accepted" << std::endl;
             packet << "PoliteDisconnect\r\nAccepted\r\n\r\n";
@@ -357,7 +425,8 @@ void CPnpAdapter::HandleRead(const boost::system::error_code & e)
 /// Prepares the next read operation after a successful write.
 ///
 /// @pre None.
-/// @post If the m_stopping flag has been raised, stops the adapter.
+/// @post If the m_stopping flag has been raised, stops the adapter and shuts
+/// down the sending side of m_client once the final reply has been written.
 /// @post Otherwise, prepares the next read with CPnpAdapter::StartRead.
 /// @param e The error code associated with the last write operation.
 ///
@@ -370,13 +439,21 @@ void CPnpAdapter::AfterWrite(const boost::system::error_code & e)
     boost::lock_guard<boost::mutex> lock(m_stoppingMutex);
     if( !m_stopping && !e )
     {
-        Heartbeat();
         StartRead();
     }
     else
     {
         Logger.Debug << "AfterWrite giving up: "
                 << (m_stopping ? "stop received" : e.message()) << std::endl;
+
+        if( m_stopping && !e )
+        {
+            // send the FIN right behind the final reply instead of waiting
+            // for the socket to close when this adapter is destroyed
+            boost::system::error_code ec;
+            m_client->shutdown(boost::asio::ip::tcp::socket::shutdown_send,
+                    ec);
+        }
     }
 }
 
@@ -388,47 +465,47 @@ void CPnpAdapter::AfterWrite(const boost::system::error_code & e)
 /// @post Extracts the device state information from packet.
 /// @post Updates m_rxBuffer with the new state information.
 /// @param packet The device packet that contains updated state information.
+/// @param pos The offset of the state information within the packet.
 ///
 /// @limitations None.
 ////////////////////////////////////////////////////////////////////////////////
-void CPnpAdapter::ReadStatePacket(const std::string packet)
+void CPnpAdapter::ReadStatePacket(const std::string & packet,
+        std::size_t pos)
 {
     Logger.Trace << __PRETTY_FUNCTION__ << std::endl;
 
     std::map<std::size_t, SignalValue> temp;
     std::map<std::size_t, SignalValue>::iterator it, end;
+    std::map<const DeviceSignal, const std::size_t>::const_iterator info;
 
-    std::stringstream out;
     std::string name, signal, strval;
 
     std::size_t index;
     SignalValue value;
 
-    Logger.Debug << "Processing packet: " << packet;
-
-    out << packet;
+    Logger.Debug << "Processing packet: ";
+    Logger.Debug.write(packet.data() + pos, packet.size() - pos);
 
-    while( out >> name >> signal >> strval )
+    while( NextToken(packet, pos, name) && NextToken(packet, pos, signal)
+            && NextToken(packet, pos, strval) )
     {
         name = m_identifier + ":" + name;
         boost::replace_all(name, ".", ":");
 
-        Logger.Debug << "Parsing: " << name << " " << signal << std::endl;
+        info = m_stateInfo.find(DeviceSignal(name, signal));
 
-        DeviceSignal devsig(name, signal);
-        std::string devsigstr = name + " " + signal;
-
-        if( m_stateInfo.count(devsig) == 0 )
+        if( info == m_stateInfo.end() )
         {
-            throw EBadRequest("Unknown device signal: " + devsigstr);
+            throw EBadRequest("Unknown device signal: " + name + " " + signal);
         }
 
-        index = m_stateInfo[devsig];
+        index = info->second;
         value = boost::lexical_cast<SignalValue>(strval);
 
         if( temp.insert(std::make_pair(index, value)).second == false )
         {
-            throw EBadRequest("Duplicate device signal: " + devsigstr);
+            throw EBadRequest("Duplicate device signal: " + name + " "
+                    + signal);
         }
     }
 
@@ -449,45 +526,32 @@ void CPnpAdapter::ReadStatePacket(const std::string packet)
 }
 
 ////////////////////////////////////////////////////////////////////////////////
-/// Generates the next command packet from the current DGI commands.
+/// Writes the next command packet from the current DGI commands.
 ///
 /// @pre None.
-/// @post Creates a command packet from the content of m_txBuffer.
-/// @return A string that contains the next command packet.
+/// @post Writes a command packet from the content of m_txBuffer to packet.
+/// @param packet The output stream that receives the command packet.
 ///
 /// @limitations None.
 ////////////////////////////////////////////////////////////////////////////////
-std::string CPnpAdapter::GetCommandPacket()
+void CPnpAdapter::WriteCommandPacket(std::ostream & packet)
 {
     Logger.Trace << __PRETTY_FUNCTION__ << std::endl;
 
-    std::map<const DeviceSignal, const std::size_t>::iterator it, end;
-    std::stringstream packet;
-    std::string devname, signal;
-    SignalValue value;
-    std::size_t index;
+    std::vector<CommandEntry>::iterator it, end;
 
     packet << "DeviceCommands\r\n";
 
     boost::unique_lock<boost::shared_mutex> lock(m_txMutex);
 
-    end = m_commandInfo.end();
-    for( it = m_commandInfo.begin(); it != end; it++ )
+    end = m_commands.end();
+    for( it = m_commands.begin(); it != end; it++ )
     {
-        devname = it->first.first;
-        signal = it->first.second;
-
-        // remove the hostname identifier
-        index = devname.find_last_of(":");
-        devname = devname.substr(index+1);
-
-        value = m_txBuffer[it->second];
-
-        packet << devname << " " << signal << " " << value << "\r\n";
+        packet << it->first << m_txBuffer[it->second] << "\r\n";
     }
-    Logger.Debug << "Sending packet:\n" << packet.str() << std::endl;
     packet << "\r\n";
-    return packet.str();
+    Logger.Debug << "Sending " << m_commands.size() << " commands."
+            << std::endl;
 }
 
 } // namespace device
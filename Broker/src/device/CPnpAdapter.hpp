@@ -26,6 +26,10 @@
 #include "IBufferAdapter.hpp"
 #include "CTcpServer.hpp"
 
+#include <string>
+#include <utility>
+#include <vector>
+
 #include <boost/asio.hpp>
 #include <boost/thread.hpp>
 #include <boost/shared_ptr.hpp>
@@ -71,6 +75,9 @@ public:
     /// Destructs the object.
     ~CPnpAdapter();
 private:
+    /// Command packet line prefix of a command with its m_txBuffer index.
+    typedef std::pair<std::string, std::size_t> CommandEntry;
+
     /// Initializes the TCP server and internal storage.
     CPnpAdapter(boost::asio::io_service & service,
             boost::property_tree::ptree & p, CTcpServer::Connection client);
@@ -85,16 +92,16 @@ private:
     void StartWrite();
 
     /// Handles a packet received from the device.
-    void HandleRead(const boost::system::error_code & e);
+    void HandleRead(const boost::system::error_code & e, std::size_t bytes);
 
     /// Handles when a packet has been sent to the device.
     void AfterWrite(const boost::system::error_code & e);
 
     /// Parses a state packet received from the client.
-    void ReadStatePacket(const std::string packet);
+    void ReadStatePacket(const std::string & packet, std::size_t pos);
 
-    /// Sends device commands to the current client.
-    std::string GetCommandPacket();
+    /// Writes device commands for the current client to a stream.
+    void WriteCommandPacket(std::ostream & packet);
 
     /// Countdown until the object destroys itself.
     boost::shared_ptr<boost::asio::deadline_timer> m_countdown;
@@ -111,6 +118,12 @@ private:
     /// Stream used to send and receive data.
     boost::asio::streambuf m_buffer;
 
+    /// Most recent packet received from the device, reused across reads.
+    std::string m_frame;
+
+    /// Line prefix and m_txBuffer index of each command.
+    std::vector<CommandEntry> m_commands;
+
     /// Signifies that the adapter is to stop.
     bool m_stopping;
 
@@ -18,6 +18,7 @@
 ///     CTcpServer::GetHostname
 ///     CTcpServer::StartAccept
 ///     CTcpServer::HandleAccept
+///     CTcpServer::HandleRetry
 ///     CTcpServer::hdr
 ///
 ///
@@ -49,6 +50,9 @@ namespace device {
 namespace {
 /// This file's logger.
 CLocalLogger Logger(__FILE__);
+
+/// Milliseconds to wait before accepting again after a failed accept.
+const unsigned int ACCEPT_RETRY_DELAY = 500;
 }
 
 ////////////////////////////////////////////////////////////////////////////////
@@ -65,6 +69,7 @@ CLocalLogger Logger(__FILE__);
 CTcpServer::CTcpServer(boost::asio::io_service & ios, unsigned short port,
     const std::string address)
     : m_acceptor(ios)
+    , m_retry(ios)
     , m_port(port)
 {
     Logger.Trace << __PRETTY_FUNCTION__ << std::endl;
@@ -201,11 +206,14 @@ void CTcpServer::StartAccept()
 /// @ErrorHandling Throws a std::runtime_error if the connection handler has
 /// not been defined with CTcpServer::RegisterHandler.
 /// @pre CTcpServer::RegisterHandler must be called prior to this function.
+/// @post Disables Nagle's algorithm on the accepted client socket.
 /// @post Calls m_handler to handle the client connection.
+/// @post If the accept failed, schedules the next accept after a delay.
 /// @param error The error code if the connection failed.
 ///
-/// @limitations This function will not schedule the next accept. The owner of
-/// the handler must call CTcpServer::StartAccept when done with the client.
+/// @limitations This function will not schedule the next accept after a
+/// successful connection. The owner of the handler must call
+/// CTcpServer::StartAccept when done with the client.
 /// This limitation is because the server handles at most one connection, and
 /// that connection must be closed before the next accept can be scheduled.
 ////////////////////////////////////////////////////////////////////////////////
@@ -217,6 +225,16 @@ void CTcpServer::HandleAccept(const boost::system::error_code & error)
     {
         Logger.Info << hdr() << "Accepted new client connection." << std::endl;
 
+        // each packet is a complete request or response, so do not let
+        // Nagle's algorithm hold it back waiting for an acknowledgement
+        boost::system::error_code ec;
+        m_client->set_option(boost::asio::ip::tcp::no_delay(true), ec);
+        if( ec )
+        {
+            Logger.Warn << hdr() << "Failed to set TCP_NODELAY: "
+                    << ec.message() << std::endl;
+        }
+
         if( m_handler.empty() )
         {
             throw std::runtime_error(hdr() + "Null connection handler.");
@@ -225,7 +243,35 @@ void CTcpServer::HandleAccept(const boost::system::error_code & error)
     }
     else if( error != boost::asio::error::operation_aborted )
     {
-        Logger.Warn << hdr() << "Failed to accept a client." << std::endl;
+        Logger.Warn << hdr() << "Failed to accept a client: "
+                << error.message() << std::endl;
+
+        // no client was handed to m_handler, so nobody else will restart us;
+        // errors such as EMFILE persist, so back off rather than spin
+        m_retry.expires_from_now(
+                boost::posix_time::milliseconds(ACCEPT_RETRY_DELAY));
+        m_retry.async_wait(boost::bind(&CTcpServer::HandleRetry, this,
+                boost::asio::placeholders::error));
+    }
+}
+
+////////////////////////////////////////////////////////////////////////////////
+/// Accepts the next client once the delay after a failed accept expires.
+///
+/// @pre None.
+/// @post Calls CTcpServer::StartAccept unless the retry was cancelled, which
+/// does nothing if CTcpServer::Stop has closed the acceptor.
+/// @param error The error code associated with the retry timer.
+///
+/// @limitations None.
+////////////////////////////////////////////////////////////////////////////////
+void CTcpServer::HandleRetry(const boost::system::error_code & error)
+{
+    Logger.Trace << hdr() << __PRETTY_FUNCTION__ << std::endl;
+
+    if( !error )
+    {
+        StartAccept();
     }
 }
 
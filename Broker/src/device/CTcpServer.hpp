@@ -77,12 +77,18 @@ private:
     /// Handles an accepted client connection.
     void HandleAccept(const boost::system::error_code & error);
 
+    /// Retries the accept after a failed client connection.
+    void HandleRetry(const boost::system::error_code & error);
+
     /// Gets a log header.
     std::string hdr() const;
 
     /// Acceptor for new client connections.
     boost::asio::ip::tcp::acceptor m_acceptor;
 
+    /// Delays the next accept after a failed client connection.
+    boost::asio::deadline_timer m_retry;
+
     /// Port number of the server.
     unsigned short m_port;
 
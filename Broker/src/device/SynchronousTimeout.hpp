@@ -88,7 +88,7 @@ void TimedRead(ReadStream & stream, const BufferSequence & buffer,
 
     while( !(*result) && !(*timeout) )
     {
-        ios.poll();
+        ios.run_one();
     }
 
     if( *result && (*result)->value() == boost::system::errc::success )
@@ -143,7 +143,7 @@ void TimedReadUntil(ReadStream & stream,
 
     while( !(*result) && !(*timeout) )
     {
-        ios.poll();
+        ios.run_one();
     }
 
     if( *result && (*result)->value() == boost::system::errc::success )
@@ -194,7 +194,7 @@ void TimedWrite(WriteStream & stream, const BufferSequence & buffer,
 
     while( !(*result) && !(*timeout) )
     {
-        ios.poll();
+        ios.run_one();
     }
 
     if( *result && (*result)->value() == boost::system::errc::success )
@@ -246,7 +246,7 @@ void TimedWrite(WriteStream & stream,
 
     while( !(*result) && !(*timeout) )
     {
-        ios.poll();
+        ios.run_one();
     }
 
     if( *result && (*result)->value() == boost::system::errc::success )